@@ -1,9 +1,21 @@
 import qisge
 
-from microqiskit import QuantumCircuit, simulate
+import numpy as np
 
+import cmath
+import functools
 import math, random, time
 
+# numba is not part of the standard install, so only use it when present
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# constant factors used by the tile angles, computed once
+_pi7 = math.pi/7
+_pi100 = math.pi/100
+
 # load images
 images = qisge.ImageList([
     'terrain-water.png',
@@ -16,54 +28,118 @@ images = qisge.ImageList([
     ])
 terrain_types = len(images)
 
-# define function that gets image ids for each tile
-def get_image_id(x,y):
+# define the per-tile loop over the grid as a plain function, so that
+# numba can compile it to native code when available
+def _fill_ids(pos_x,pos_y,seed,terrain_types,out):
+    for dx in range(28):
+        for dy in range(16):
+            x = float(pos_x+dx)
+            y = float(pos_y+dy)
+
+            # the same (x,y) dependent angles as the numpy version below
+            d = math.sqrt(x*x+y*y)
+            f0 = seed[0]*math.cos(seed[0]*d*_pi100)
+            f1 = seed[1]*math.cos(seed[1]*d*_pi100)
+            f2 = seed[2]*math.cos(seed[2]*d*_pi100)
+            f3 = seed[3]*math.cos(seed[3]*d*_pi100)
+            f4 = seed[4]*math.cos(seed[4]*d*_pi100)
+            f5 = seed[5]*math.cos(seed[5]*d*_pi100)
+            tx = (f0*x + f1*y)*_pi7
+            ty = (f2*x - f3*y)*_pi7
+            tz = (f4*(x+y) + f5*(x-y))*_pi7
+
+            # track the amplitudes through rx(tx), rz(tz), ry(ty)
+            amp0 = math.cos(tx/2)*cmath.exp(-0.5j*tz)
+            amp1 = -1j*math.sin(tx/2)*cmath.exp(0.5j*tz)
+            cy = math.cos(ty/2)
+            sy = math.sin(ty/2)
+            amp0,amp1 = cy*amp0 - sy*amp1, sy*amp0 + cy*amp1
+
+            # an h gate is applied on the diagonal
+            if pos_x+dx==pos_y+dy:
+                amp0 = (amp0+amp1)/math.sqrt(2)
+
+            p = abs(amp0)**2
+            out[dx,dy] = int(round(p*(terrain_types-1)))
+
+if njit is not None:
+    _fill_ids = njit(cache=True,fastmath=True)(_fill_ids)
+
 
-    # set up a single qubit circuit
-    qc = QuantumCircuit(1)
+# define function that gets the image ids for all tiles at once
+# (the seed is fixed for the whole run, so the ids for a given position
+# never change and can be cached)
+@functools.lru_cache(maxsize=1024)
+def get_image_ids(pos_x,pos_y):
+
+    # use the compiled loop when numba is available
+    if njit is not None:
+        out = np.empty((28,16),dtype=np.int64)
+        _fill_ids(pos_x,pos_y,_seed,terrain_types,out)
+        return out
+
+    # world coordinates for each tile (remembering screen is 28x16)
+    x,y = np.meshgrid(np.arange(28)+pos_x,np.arange(16)+pos_y,indexing='ij')
 
     # define some (x,y) dependent angles
-    d = math.sqrt(x**2+y**2)
-    f = [ s*math.cos(s*d*math.pi/100) for s in seed]
-    tx = (f[0]*x + f[1]*y)*math.pi/7
-    ty = (f[2]*x - f[3]*y)*math.pi/7
-    tz = (f[4]*(x+y) + f[5]*(x-y))*math.pi/7
+    d = np.sqrt(x**2+y**2)
+    f = [ s*np.cos(s*d*_pi100) for s in seed]
+    tx = (f[0]*x + f[1]*y)*_pi7
+    ty = (f[2]*x - f[3]*y)*_pi7
+    tz = (f[4]*(x+y) + f[5]*(x-y))*_pi7
 
-    # add rotations by these angles to the circuit
-    qc.rx(tx,0)
-    qc.rz(tz,0)
-    qc.ry(ty,0)
+    # each tile is the single qubit circuit rx(tx), rz(tz), ry(ty) on |0>;
+    # build the fused ry*rz*rx matrix of every tile as one stacked array
+    # (note that the rz phases end up mixed into the amplitudes by the
+    # ry that follows, so tz does affect the outcome and cannot be
+    # dropped from the fused matrix)
+    cx = np.cos(tx/2)
+    sx = np.sin(tx/2)
+    cy = np.cos(ty/2)
+    sy = np.sin(ty/2)
+    ez = np.exp(-1j*tz/2)
+    cez = np.conj(ez)
+    u = np.empty((28,16,2,2),dtype=complex)
+    u[...,0,0] = cy*cx*ez + 1j*sy*sx*cez
+    u[...,0,1] = -1j*cy*sx*ez - sy*cx*cez
+    u[...,1,0] = sy*cx*ez - 1j*cy*sx*cez
+    u[...,1,1] = cy*cx*cez - 1j*sy*sx*ez
 
-    if x==y:
-        qc.h(0)
+    # fold the h gate applied on the diagonal into the matrix stack
+    u[x==y] = np.array([[1,1],[1,-1]])/np.sqrt(2) @ u[x==y]
 
-    # simulate it to get the probability of a 0 outcome
-    ket = simulate(qc,get='statevector')
-    p = ket[0][0]**2 + ket[0][1]**2
-    
-    # scale and round the result to get an image id
-    image_id = int(round(p*(terrain_types-1)))
+    # apply the whole stack to |0> in a single einsum call
+    ket = np.einsum('...ab,b->...a', u, np.array([1,0],dtype=complex))
 
-    return image_id
+    # get the probability of a 0 outcome for each tile
+    p = np.abs(ket[...,0])**2
+
+    # scale and round the results to get the image ids
+    return np.rint(p*(terrain_types-1)).astype(int)
 
 
 # generate random seed
 seed = [0.5*random.random() for _ in range(6)]
+_seed = np.array(seed)
 
 pos_x = 0
 pos_y = 0
 
-sprite = {} # sprites for each tile
-# loop over all tiles (remembering screen is 28x16)
+# fill the ids for the starting position; when numba is present this
+# first call also compiles the loop kernel (cached across runs) while
+# the game is still loading, so the first key press is not stalled
+ids = get_image_ids(pos_x,pos_y)
+
+sprite = [None]*(28*16) # sprites for each tile, indexed by dx*16+dy
 for dx in range(28):
     for dy in range(16):
-        sprite[dx,dy] = qisge.Sprite(get_image_id(pos_x+dx,pos_x+dy),x=dx,y=dy,z=0)
+        sprite[dx*16+dy] = qisge.Sprite(int(ids[dx,dy]),x=dx,y=dy,z=0)
 
         
 def next_frame(input):
-        
-    global pos_x,pos_y
-        
+
+    global pos_x,pos_y,ids
+
     pressed = False
     if 0 in input['key_presses']:
         pos_y += 1
@@ -79,6 +155,8 @@ def next_frame(input):
         pressed = True
         
     if pressed:
-        for dx in range(28):
-            for dy in range(16):
-                sprite[dx,dy].image_id = get_image_id(pos_x+dx,pos_y+dy)
\ No newline at end of file
+        new_ids = get_image_ids(pos_x,pos_y)
+        # only touch the sprites whose image actually changed
+        for dx,dy in np.argwhere(new_ids!=ids):
+            sprite[dx*16+dy].image_id = int(new_ids[dx,dy])
+        ids = new_ids
\ No newline at end of file
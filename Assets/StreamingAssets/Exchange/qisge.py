@@ -1,8 +1,14 @@
 import json
+import numpy as np
 from renderer import _get_input, _update_screen
 
 FPS = 30
 
+# one reusable encoder, set up for compact output without ascii escaping
+# (the exchange files are read as utf-8 on the Unity side)
+_encode = json.JSONEncoder(separators=(',',':'),ensure_ascii=False,
+                           check_circular=False).encode
+
 def _val_change(key,value,dictionary):
     '''Returns whether the given dictionary has the given value at the given key.'''
     if key in dictionary:
@@ -20,28 +26,39 @@ def update(wait=True):
 class _Engine():
     
     def __init__(self):
-        self.image_changes = []
-        self.sprite_changes = {}
+        # image and sound changes are keyed by id, so rewriting the same
+        # slot before an update only ships the last filename
+        self.image_changes = {}
         self.camera_changes = {}
         self.text_changes = {}
-        self.sound_changes = []
+        self.sound_changes = {}
         self.channel_changes = {}
-                
+
     def get_changes(self):
+        # collect the sprite attribute changes since the last frame
+        sprite_changes = _sprite_data.get_changes()
+        # if nothing has changed, return an empty string so that no
+        # write to 'sprite.txt' is made for this frame
+        if not (sprite_changes or self.image_changes
+                or self.camera_changes or self.text_changes
+                or self.sound_changes or self.channel_changes):
+            return ''
         # make the changes dictionary
-        changes = {}
-        for attr in self.__dict__:
-            if attr in ['sprite_changes','text_changes','channel_changes']:
-                changes[attr] = list(self.__dict__[attr].values())
-            else:
-                changes[attr] = self.__dict__[attr]
+        changes = {
+            'image_changes': [{'image_id':i,'filename':f}
+                              for i,f in self.image_changes.items()],
+            'sprite_changes': sprite_changes,
+            'camera_changes': self.camera_changes,
+            'text_changes': list(self.text_changes.values()),
+            'sound_changes': [{'sound_id':i,'filename':f}
+                              for i,f in self.sound_changes.items()],
+            'channel_changes': list(self.channel_changes.values()),
+            }
         # empty the record of changes
-        self.image_changes = []
-        self.sound_changes = []
-        for attr in ['sprite_changes','text_changes','channel_changes','camera_changes']:
+        for attr in self.__dict__:
             self.__dict__[attr] = {}
         # output the string of changes
-        return json.dumps(changes)
+        return _encode(changes)
 
 
 class ImageList(list):
@@ -51,7 +68,7 @@ class ImageList(list):
             self.append(filename)
             
     def _record(self,image_id,filename):
-        _engine.image_changes.append({'image_id':image_id,'filename':filename})
+        _engine.image_changes[image_id] = filename
         
     def __setitem__(self,image_id,filename):
         super().__setitem__(image_id,filename)
@@ -70,7 +87,7 @@ class SoundList(list):
             self.append(filename)
             
     def _record(self,sound_id,filename):
-        _engine.sound_changes.append({'sound_id':sound_id,'filename':filename})
+        _engine.sound_changes[sound_id] = filename
         
     def __setitem__(self,sound_id,filename):
         super().__setitem__(sound_id,filename)
@@ -98,12 +115,71 @@ class Camera():
         self.__dict__[name] = val
 
 
+class _SpriteData():
+    '''Holds the state of all sprites in one array per attribute, along
+    with a snapshot of the state sent with the last update.'''
+
+    attrs = ('image_id','x','y','z','size','angle','flip_h','flip_v')
+    int_attrs = ('image_id','flip_h','flip_v')
+
+    def __init__(self,capacity=64):
+        self.num_sprites = 0
+        self.arrays = {}
+        for attr in self.attrs:
+            dtype = int if attr in self.int_attrs else float
+            self.arrays[attr] = np.zeros(capacity,dtype=dtype)
+        # sprites created since the last update, whose attributes must
+        # all be sent
+        self.new = np.zeros(capacity,dtype=bool)
+        # the state at the last update, filled in by get_changes
+        self.sent = {}
+
+    def add(self):
+        '''Registers a new sprite and returns its sprite id.'''
+        sprite_id = self.num_sprites
+        if sprite_id==len(self.new):
+            # all arrays are full, so double their size
+            for attr in self.attrs:
+                self.arrays[attr] = np.concatenate(
+                    [self.arrays[attr],np.zeros_like(self.arrays[attr])])
+            self.new = np.concatenate([self.new,np.zeros_like(self.new)])
+        self.new[sprite_id] = True
+        self.num_sprites += 1
+        return sprite_id
+
+    def get_changes(self):
+        '''Returns the list of per-sprite change records since the last
+        call, and takes a new snapshot of the current state.'''
+        n = self.num_sprites
+        records = {}
+        for attr in self.attrs:
+            current = self.arrays[attr][:n]
+            # compare with the snapshot, treating new sprites as changed
+            changed = self.new[:n].copy()
+            sent = self.sent.get(attr)
+            if sent is not None:
+                m = len(sent)
+                changed[:m] |= current[:m]!=sent
+            # record the changed values for each sprite
+            convert = int if attr in self.int_attrs else float
+            for sprite_id in np.nonzero(changed)[0]:
+                sprite_id = int(sprite_id)
+                record = records.setdefault(sprite_id,
+                                            {'sprite_id':sprite_id})
+                record[attr] = convert(current[sprite_id])
+            self.sent[attr] = current.copy()
+        self.new[:n] = False
+        return list(records.values())
+
+
 class Sprite():
+
+    __slots__ = ('sprite_id',)
+
     def __init__(self,image_id,x=0,y=0,z=0,size=1,angle=0,flip_h=0,flip_v=0):
-        
-        self.sprite_id = len(_engine.sprite_changes)
-        _engine.sprite_changes[self.sprite_id] = {}
-        
+
+        object.__setattr__(self,'sprite_id',_sprite_data.add())
+
         self.image_id = image_id
         self.x = x
         self.y = y
@@ -112,17 +188,21 @@ class Sprite():
         self.flip_v = flip_v
         self.size = size
         self.angle = angle
-        
+
     def __setattr__(self,name,val):
-        # only do something if the value actually changes
-        if _val_change(name,val,self.__dict__):
-            if name!='sprite_id':
-                # record the updated value for the thing that's changed
-                if self.sprite_id not in _engine.sprite_changes:
-                    _engine.sprite_changes[self.sprite_id] = {}
-                _engine.sprite_changes[self.sprite_id]['sprite_id'] = self.sprite_id
-                _engine.sprite_changes[self.sprite_id][name] = val
-            self.__dict__[name] = val
+        # write straight into the per-attribute array; changes are
+        # picked out by comparing against the last sent snapshot
+        try:
+            _sprite_data.arrays[name][self.sprite_id] = val
+        except KeyError:
+            raise AttributeError('Sprite has no attribute '+repr(name))
+
+    def __getattr__(self,name):
+        try:
+            val = _sprite_data.arrays[name][self.sprite_id]
+        except KeyError:
+            raise AttributeError('Sprite has no attribute '+repr(name))
+        return int(val) if name in _SpriteData.int_attrs else float(val)
 
 
 class Sound():
@@ -220,6 +300,7 @@ def hide_print():
     _print_buffer.set_border_color((255,255,255,0))
 
 
+_sprite_data = _SpriteData()
 _engine = _Engine()
 camera = Camera()
 
@@ -1,44 +1,66 @@
 import json
+import os
 from os.path import dirname, abspath, join
 import time
 
+# the folder this file is in, where the exchange files live
+_dir = dirname(abspath(__file__))
+# the two exchange files, resolved once at module load
+_sprite_path = join(_dir,'sprite.txt')
+_input_path = join(_dir,'input.txt')
 
-def _read(filename):
-    '''Returns the contents of the given file.'''
-    filename=join( dirname(abspath(__file__)), filename)
-    with open(filename,'r') as file:
-        return file.read()
-      
-def _write(filename,message):
-    '''Writes the given message to the given file.'''
-    filename=join( dirname(abspath(__file__)), filename)
-    with open(filename,'w') as file:
-        file.write(message)
+
+def _read(path):
+    '''Returns the contents of the file at the given path.'''
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = b''
+        while True:
+            chunk = os.read(fd, 1<<16)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        os.close(fd)
+    return data.decode('utf-8')
+
+def _write(path,message):
+    '''Writes the given message to the file at the given path.'''
+    fd = os.open(path, os.O_WRONLY|os.O_CREAT|os.O_TRUNC)
+    try:
+        os.write(fd, message.encode('utf-8'))
+    finally:
+        os.close(fd)
 
 def _scrub():
     '''Empties the files 'sprite.txt' and 'input.txt'.'''
-    _write('sprite.txt','')
-    _write('input.txt','')
+    _write(_sprite_path,'')
+    _write(_input_path,'')
 
 def _get_input():
     '''Returns the dictionary of inputs from 'input.txt' and empties the file.'''
-    raw_input = _read('input.txt')
-    _write('input.txt','')
+    # a single stat tells us whether there is anything to read at all
+    if os.stat(_input_path).st_size==0:
+        return {'key_presses': frozenset(), 'clicks': []}
+    raw_input = _read(_input_path)
+    _write(_input_path,'')
     if raw_input:
         input = json.loads(raw_input)
+        # turn the list of key presses into a frozenset, so that the
+        # `in` checks done by games are hash lookups rather than scans
+        input['key_presses'] = frozenset(input['key_presses'])
     else:
-        input = {'key_presses': [], 'clicks': []}
+        input = {'key_presses': frozenset(), 'clicks': []}
     return input
 
 def _update_screen(changes,wait=True):
     '''Write the changes from the engine to 'sprite.txt'.'''
     if changes:
         # if there are already changes in the queue, wait
-        queue = _read('sprite.txt')
-        while queue!='' and wait:
+        # (checking the file size avoids reading the contents)
+        while wait and os.stat(_sprite_path).st_size!=0:
             time.sleep(1/100)
-            queue = _read('sprite.txt')
         # write new changes
-        _write('sprite.txt',changes)
+        _write(_sprite_path,changes)
 
-_scrub()
\ No newline at end of file
+_scrub()
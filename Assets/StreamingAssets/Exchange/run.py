@@ -9,22 +9,21 @@ try:
     from game import qisge, next_frame
 
     input = qisge.update()
-    frame = 0
-    t0 = time.time()
+    frame_time = 1/qisge.FPS
+    next_tick = time.monotonic()
     while True:
 
         next_frame(input)
 
         # update screen
         input = qisge.update()
-        
-        # update the number of frames that have been rendered
-        frame += 1
-        # and check the number that should have been rendered by now
-        expected_frame = (time.time()-t0)*qisge.FPS
-        # add a pause if we are ahead of time
-        if frame > expected_frame:
-            time.sleep(1/qisge.FPS)
+
+        # work out when the next frame is due
+        next_tick += frame_time
+        # and add a pause if we are ahead of time
+        pause = next_tick - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
             
 except:
     import qisge 